@@ -0,0 +1,382 @@
+#!/usr/local/bin/python3
+#
+# Fairness and coverage analytics for the generated forms.
+#
+# Everything is driven off a participant x question assignment matrix that is
+# stored column-wise: one bitset (a Python int) per question, with bit i set
+# when participant i gets that question on their printed form.  Counting and
+# combining questions is then popcount / OR over whole columns rather than a
+# walk over every form.
+
+import array
+import json
+
+import streams
+
+# Which percentiles of the form difficulty distribution to report.
+DIFFICULTY_PERCENTILES = (5, 10, 25, 50, 75, 90, 95)
+
+# How many equal width bins to use for the difficulty histogram.
+DIFFICULTY_HISTOGRAM_BINS = 10
+
+REPORT_HEADER = """
+<html>
+<head>
+<style>
+  * {
+   font-family: Helvetica, sans-serif;
+  }
+  table {
+    border-spacing: 0;
+    margin-bottom: 2em;
+  }
+  td, th {
+    font-size: 10pt;
+    padding: 0.2em 1em;
+    border-bottom: 1px solid lightgrey;
+    text-align: right;
+  }
+  td.text, th.text {
+    text-align: left;
+  }
+</style>
+</head>
+<body>
+<h1>Icebreaker Form Report</h1>
+"""
+
+REPORT_FOOTER = """
+</body>
+</html>
+"""
+
+
+def percentile(sorted_values, pct):
+    """
+    Return the pct'th percentile of an already sorted sequence, linearly
+    interpolating between the two closest ranks.
+    """
+    if len(sorted_values) == 0:
+        return 0.0
+    rank = (len(sorted_values) - 1) * pct / 100.0
+    low = int(rank)
+    high = min(low + 1, len(sorted_values) - 1)
+    return (
+        sorted_values[low]
+        + (sorted_values[high] - sorted_values[low]) * (rank - low))
+
+
+class AssignmentMatrix:
+    """
+    Which participant got which question, as it will be printed.  Only the
+    first num_questions questions of each participant make it onto the form,
+    so anything past that is tracked separately as dropped.
+    """
+
+    def __init__(self, participants, questions, num_questions):
+        """
+        Build the matrix from participants that have already had questions
+        allocated to them.
+        """
+        self.question_list = questions.question_list
+        self.participant_count = participants.get_count()
+        self.num_questions = num_questions
+
+        question_index = {}
+        for q_i, q in enumerate(self.question_list):
+            question_index[q] = q_i
+        difficulties = array.array(
+            "d", [q.difficulty for q in self.question_list])
+
+        # One byte buffer per question while building; bits are set in place
+        # and each buffer is turned into an int bitset in one go at the end.
+        n_bytes = (self.participant_count + 7) // 8
+        columns = [bytearray(n_bytes) for q in self.question_list]
+        self.dropped_counts = array.array("l", [0] * len(self.question_list))
+
+        # Per form summaries, one slot per participant.
+        self.form_sizes = array.array("l")
+        self.form_difficulties = array.array("d")
+
+        for p_i, p in enumerate(participants.participants):
+            byte_i = p_i >> 3
+            bit = 1 << (p_i & 7)
+            form_q_is = [question_index[q] for q in p.questions]
+            for q_i in form_q_is[:num_questions]:
+                columns[q_i][byte_i] |= bit
+            for q_i in form_q_is[num_questions:]:
+                self.dropped_counts[q_i] += 1
+            self.form_sizes.append(len(form_q_is))
+            self.form_difficulties.append(
+                sum(map(difficulties.__getitem__, form_q_is[:num_questions])))
+
+        self.columns = [int.from_bytes(col, "little") for col in columns]
+
+        return None
+
+    def get_achieved_counts(self):
+        """
+        Number of printed forms each question appears on.
+        """
+        return [col.bit_count() for col in self.columns]
+
+    def get_coverage(self, question_indices):
+        """
+        Number of participants that have at least one of the given questions
+        on their printed form.
+        """
+        combined = 0
+        for q_i in question_indices:
+            combined |= self.columns[q_i]
+        return combined.bit_count()
+
+
+class FormsReport:
+    """
+    Summary of how fair the generated forms are and how well they cover
+    the questions and the data questions.
+    """
+
+    def __init__(
+            self, participants, questions, data_questions, num_questions,
+            plan=None):
+        """
+        Compute the report for participants that have already had questions
+        allocated to them.  If the quota plan the allocation followed is
+        given, it is reported alongside what was achieved.
+        """
+        self.matrix = AssignmentMatrix(participants, questions, num_questions)
+        self.data_questions = data_questions
+        self.plan = plan
+        self.report = {
+            "participants": self.matrix.participant_count,
+            "questions": len(self.matrix.question_list),
+            "questions_per_form": num_questions,
+            "difficulty": self._difficulty_summary(),
+            "forms": self._form_fill_summary(),
+            "question_penetrance": self._penetrance_summary(),
+            "data_question_coverage": self._data_coverage_summary(),
+        }
+        if plan is not None:
+            self.report["quota_plan"] = plan.to_dict()
+
+        return None
+
+    def _difficulty_summary(self):
+        """
+        Distribution of total difficulty across printed forms.
+        """
+        values = sorted(self.matrix.form_difficulties)
+        if len(values) == 0:
+            return {}
+        n = len(values)
+        mean = sum(values) / n
+        variance = sum((v - mean) ** 2 for v in values) / n
+
+        low = values[0]
+        high = values[-1]
+        width = (high - low) / DIFFICULTY_HISTOGRAM_BINS or 1.0
+        bins = [0] * DIFFICULTY_HISTOGRAM_BINS
+        for v in values:
+            bins[min(int((v - low) / width),
+                     DIFFICULTY_HISTOGRAM_BINS - 1)] += 1
+
+        return {
+            "min": low,
+            "max": high,
+            "mean": mean,
+            "stdev": variance ** 0.5,
+            "percentiles": {
+                "p{0}".format(pct): percentile(values, pct)
+                for pct in DIFFICULTY_PERCENTILES},
+            "histogram": [
+                {"from": low + b_i * width,
+                 "to": low + (b_i + 1) * width,
+                 "forms": count}
+                for b_i, count in enumerate(bins)],
+        }
+
+    def _form_fill_summary(self):
+        """
+        How many forms got fewer, exactly, or more questions than fit.
+        """
+        limit = self.matrix.num_questions
+        size_counts = {}
+        for size in self.matrix.form_sizes:
+            size_counts[size] = size_counts.get(size, 0) + 1
+
+        return {
+            "underfilled": sum(
+                c for size, c in size_counts.items() if size < limit),
+            "full": size_counts.get(limit, 0),
+            "overfilled": sum(
+                c for size, c in size_counts.items() if size > limit),
+            "sizes": {
+                str(size): size_counts[size] for size in sorted(size_counts)},
+        }
+
+    def _penetrance_summary(self):
+        """
+        Per question target versus achieved penetrance on printed forms.
+        """
+        n = self.matrix.participant_count
+        achieved_counts = self.matrix.get_achieved_counts()
+        summary = []
+        for q, achieved, dropped in zip(
+                self.matrix.question_list, achieved_counts,
+                self.matrix.dropped_counts):
+            summary.append({
+                "question": q.text,
+                "difficulty": q.difficulty,
+                "target_penetrance": q.penetrance,
+                "requested_count": (
+                    self.plan.get_requested(q) if self.plan
+                    else min(q.penetrance, 1.0) * n),
+                "planned_count": (
+                    self.plan.get_quota(q) if self.plan else None),
+                "achieved_count": achieved,
+                "achieved_penetrance": achieved / n if n else 0.0,
+                "dropped_count": dropped,
+            })
+
+        return summary
+
+    def _data_coverage_summary(self):
+        """
+        For each data question, how many of its values became questions and
+        how many participants see at least one of them.
+        """
+        n = self.matrix.participant_count
+        summary = []
+        for data_q in self.data_questions.question_list:
+            asked = [
+                q_i for q_i, q in enumerate(self.matrix.question_list)
+                if q.data_question is data_q]
+            covered = self.matrix.get_coverage(asked)
+            summary.append({
+                "input_item": data_q.input_item,
+                "output_question": data_q.output_question,
+                "values": len(data_q.participant_values),
+                "values_asked": len(asked),
+                "asked_value_penetrance": sum(
+                    self.matrix.question_list[q_i].penetrance
+                    for q_i in asked),
+                "participants_covered": covered,
+                "coverage": covered / n if n else 0.0,
+            })
+
+        return summary
+
+    def write_json(
+            self, report_path, compress_level=None, compress_thread=False):
+        """
+        Write the report out as JSON, compressed if the path asks for it.
+        See streams.open_output for the compression options.
+        """
+        fp = streams.open_output(report_path, compress_level, compress_thread)
+        json.dump(self.report, fp, indent=2)
+        fp.close()
+
+        return None
+
+    def to_html(self):
+        """
+        Render the report as a static HTML page.
+        """
+        report = self.report
+        html = [REPORT_HEADER]
+
+        html.append("<h2>Overview</h2>")
+        html.append("<table>")
+        for key in ("participants", "questions", "questions_per_form"):
+            html.append(
+                " <tr><th class='text'>{0}</th><td>{1}</td></tr>".format(
+                    key, report[key]))
+        for key in ("underfilled", "full", "overfilled"):
+            html.append(
+                " <tr><th class='text'>{0} forms</th><td>{1}</td></tr>".format(
+                    key, report["forms"][key]))
+        html.append("</table>")
+
+        if "quota_plan" in report:
+            html.append("<h2>Quota Plan</h2>")
+            html.append("<table>")
+            for key, value in report["quota_plan"].items():
+                if key == "quotas":
+                    continue   # shown per question below
+                html.append(
+                    " <tr><th class='text'>{0}</th><td>{1}</td></tr>".format(
+                        key, value))
+            html.append("</table>")
+
+        difficulty = report["difficulty"]
+        if difficulty:
+            html.append("<h2>Form Difficulty</h2>")
+            html.append("<table>")
+            for key in ("min", "max", "mean", "stdev"):
+                html.append(
+                    " <tr><th class='text'>{0}</th><td>{1:.3f}</td></tr>"
+                    .format(key, difficulty[key]))
+            for key, value in difficulty["percentiles"].items():
+                html.append(
+                    " <tr><th class='text'>{0}</th><td>{1:.3f}</td></tr>"
+                    .format(key, value))
+            html.append("</table>")
+            html.append("<table>")
+            html.append(" <tr><th>from</th><th>to</th><th>forms</th></tr>")
+            for b in difficulty["histogram"]:
+                html.append(
+                    " <tr><td>{0:.3f}</td><td>{1:.3f}</td><td>{2}</td></tr>"
+                    .format(b["from"], b["to"], b["forms"]))
+            html.append("</table>")
+
+        html.append("<h2>Question Penetrance</h2>")
+        html.append("<table>")
+        html.append(
+            " <tr><th class='text'>question</th><th>difficulty</th>"
+            + "<th>target</th><th>achieved</th><th>requested count</th>"
+            + "<th>planned count</th><th>achieved count</th>"
+            + "<th>dropped</th></tr>")
+        for q in report["question_penetrance"]:
+            planned = q["planned_count"]
+            html.append(
+                " <tr><td class='text'>{0}</td><td>{1:.2f}</td>"
+                "<td>{2:.3f}</td><td>{3:.3f}</td><td>{4:.1f}</td><td>{5}</td>"
+                "<td>{6}</td><td>{7}</td></tr>".format(
+                    q["question"], q["difficulty"], q["target_penetrance"],
+                    q["achieved_penetrance"], q["requested_count"],
+                    "" if planned is None else planned,
+                    q["achieved_count"], q["dropped_count"]))
+        html.append("</table>")
+
+        html.append("<h2>Data Question Coverage</h2>")
+        html.append("<table>")
+        html.append(
+            " <tr><th class='text'>input item</th><th>values</th>"
+            + "<th>values asked</th><th>participants covered</th>"
+            + "<th>coverage</th></tr>")
+        for d in report["data_question_coverage"]:
+            html.append(
+                " <tr><td class='text'>{0}</td><td>{1}</td><td>{2}</td>"
+                "<td>{3}</td><td>{4:.3f}</td></tr>".format(
+                    d["input_item"], d["values"], d["values_asked"],
+                    d["participants_covered"], d["coverage"]))
+        html.append("</table>")
+
+        html.append(REPORT_FOOTER)
+
+        return("\n".join(html))
+
+    def write_html(
+            self, report_html_path, compress_level=None,
+            compress_thread=False):
+        """
+        Write the report out as a static HTML page, compressed if the path
+        asks for it.
+        """
+        fp = streams.open_output(
+            report_html_path, compress_level, compress_thread)
+        fp.write(self.to_html())
+        fp.close()
+
+        return None
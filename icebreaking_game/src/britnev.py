@@ -4,8 +4,10 @@ import argparse
 import json
 import sys
 
+import analytics
 import dataquests
 import quests
+import quotas
 import partis
 
 
@@ -59,9 +61,10 @@ class Configuration (object):
                 sys.exit(-1)
 
 
-def allocate_questions_to_participants(particpants, questions):
+def allocate_questions_to_participants(participants, questions, plan):
     """
     Allocate out questions to participants until them participants are full.
+    Each question is asked exactly as many times as the quota plan says.
     """
 
     """
@@ -72,7 +75,7 @@ def allocate_questions_to_participants(particpants, questions):
     who still needs a question this iteration = everyone
 
     For each question:
-      calculate how many times that question will be asked
+      look up how many times the plan says that question will be asked
       who has this question = {}
 
       who can have this question this iter = who_still_needs_a_questin_thi_iter
@@ -91,13 +94,12 @@ def allocate_questions_to_participants(particpants, questions):
             who_still_needs_a_questin_thi_iter - who has this question
     """
 
-    num_participants = particpants.get_count()
     who_still_needs_q_this_iter = {x for x in participants.participants}
     iter = 0
 
     for q in questions.in_increasing_difficulty_order:
         # How many times should we ask the current question?
-        num_times_to_ask = int(q.penetrance * num_participants)
+        num_times_to_ask = plan.get_quota(q)
         who_has_this_q = set()
 
         who_can_have_this_q_this_iter = who_still_needs_q_this_iter.copy()
@@ -122,6 +124,66 @@ def allocate_questions_to_participants(particpants, questions):
     return None
 
 
+def generate(
+        config, participants, forms_path, mail_merge_path,
+        report_path=None, report_html_path=None,
+        compress_level=None, compress_thread=False):
+    """
+    Run one configuration against a participant library, and write out its
+    forms, mail merge spreadsheet, and optionally its report.
+
+    The configuration's data questions must already have had the participant
+    responses added to them.  Output paths ending in .gz, .bz2 or .xz are
+    compressed using compress_level and, if compress_thread is set, a
+    background compression thread.
+    """
+    questions = config.questions
+    data_questions = config.data_questions
+
+    # Convert data questions to regular questions, and add them to
+    # the questions
+    questions.convert_and_add_data_questions(
+        data_questions, config.min_2b_tractable, config.max_2b_interesting)
+
+    # Work out how many times to ask each question, so that all of them fit
+    # on the forms.
+    plan = quotas.QuotaPlan(
+        questions, participants.get_count(), config.num_questions)
+    if plan.is_over_capacity():
+        print(
+            "Questions ask for more than fits on the forms.  " +
+            "Scaling every question down.",
+            file=sys.stderr)
+        print(
+            "  Asked for: {0:.0f}  Fits: {1}  Scale: {2:.3f}".format(
+                plan.demand, plan.capacity, plan.scale),
+            file=sys.stderr)
+
+    allocate_questions_to_participants(participants, questions, plan)
+
+    # this maybe should not be in participants.
+    participants.generate_forms(
+        forms_path, config.num_questions, compress_level, compress_thread)
+
+    # but this should
+    participants.generate_spreadsheet_for_mail_merge(
+        mail_merge_path, config.labels_fields,
+        config.label_columns, config.label_rows,
+        config.labels_per_person, compress_level, compress_thread)
+
+    if report_path or report_html_path:
+        report = analytics.FormsReport(
+            participants, questions, data_questions, config.num_questions,
+            plan)
+        if report_path:
+            report.write_json(report_path, compress_level, compress_thread)
+        if report_html_path:
+            report.write_html(
+                report_html_path, compress_level, compress_thread)
+
+    return None
+
+
 def get_args():
     """
     Parse and return command line arguments.  Note that this does not parse
@@ -135,7 +197,9 @@ def get_args():
         help="Path to configuration file. Format: JSON")
     arg_parser.add_argument(
         "--participantdatapath", required=True,
-        help="Path to participant data spreadsheet.  Format: TSV")
+        help=(
+            "Path to participant data spreadsheet.  Format: TSV, " +
+            "optionally gzip, bz2 or xz compressed"))
     arg_parser.add_argument(
         "--formspath", required=True,
         help="Where to put the ouput forms.  Format: HTML")
@@ -144,38 +208,51 @@ def get_args():
         help=(
             "Where to put the output spreadsheet to feed to mail merge.  " +
             "Format: TSV"))
+    arg_parser.add_argument(
+        "--reportpath",
+        help=(
+            "Optional. Where to put the fairness and coverage report for " +
+            "the generated forms.  Format: JSON"))
+    arg_parser.add_argument(
+        "--reporthtmlpath",
+        help=(
+            "Optional. Where to put a static summary of the same report.  " +
+            "Format: HTML"))
+    arg_parser.add_argument(
+        "--compresslevel", type=int, default=None,
+        help=(
+            "Compression level for outputs whose path ends in .gz, .bz2 " +
+            "or .xz.  Default: the codec's default"))
+    arg_parser.add_argument(
+        "--compressthread", action="store_true",
+        help=(
+            "Compress output in a background thread, alongside rendering, " +
+            "instead of in between"))
 
     args = arg_parser.parse_args()
 
     return args
 
 
-args = get_args()
+def main():
+    args = get_args()
 
-# Read the config; this includes the question definitions.
-config = Configuration(args.configpath)
+    # Read the config; this includes the question definitions.
+    config = Configuration(args.configpath)
 
-questions = config.questions
-data_questions = config.data_questions
+    # Read the participant list.  This in a spreadsheet.
+    participants = partis.ParticipantLib(args.participantdatapath)
 
-# Read the participant list.  This in a spreadsheet.
-participants = partis.ParticipantLib(args.participantdatapath)
+    # Add participant values to the data-driven questions.
+    config.data_questions.add_participant_responses(participants)
 
-# Add participant values to the data-driven questions.
-data_questions.add_participant_responses(participants)
+    generate(
+        config, participants, args.formspath, args.mailmergepath,
+        args.reportpath, args.reporthtmlpath,
+        args.compresslevel, args.compressthread)
 
-# Convert data questions to regular questions, and add them to
-# the questions
-questions.convert_and_add_data_questions(
-    data_questions, config.min_2b_tractable, config.max_2b_interesting)
-
-allocate_questions_to_participants(participants, questions)
+    return None
 
-# this maybe should not be in participants.
-participants.generate_forms(args.formspath, config.num_questions)
 
-# but this should
-participants.generate_spreadsheet_for_mail_merge(
-    args.mailmergepath, config.labels_fields,
-    config.label_columns, config.label_rows,
-    config.labels_per_person)
+if __name__ == "__main__":
+    main()
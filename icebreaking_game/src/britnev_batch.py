@@ -0,0 +1,181 @@
+#!/usr/local/bin/python3
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+
+import britnev
+import partis
+
+
+USAGE = """
+Britnev batch mode.  Runs the same participant roster through several
+configurations in one go, for example the main event and its training-week
+and hackathon variants.
+
+The roster is read once, and each participant column used by a data question
+is tallied once, no matter how many configurations use it.  Each
+configuration is then allocated and rendered in its own worker process.
+"""
+
+# Items in each run of the manifest.  These match britnev's arguments.
+CONFIG_PATH_ITEM = "configpath"
+FORMS_PATH_ITEM = "formspath"
+MAIL_MERGE_PATH_ITEM = "mailmergepath"
+REPORT_PATH_ITEM = "reportpath"
+REPORT_HTML_PATH_ITEM = "reporthtmlpath"
+
+# The participant library, set once in each worker process.
+worker_participants = None
+
+
+class Manifest (object):
+    """
+    Parses and then exposes the batch manifest.  It is defined as
+
+        [
+            {
+                "configpath": "britnev-config-gcc.json",
+                "formspath": "gcc-forms.html",
+                "mailmergepath": "gcc-labels.csv",
+                "reportpath": "gcc-report.json"
+            },
+            {
+                "configpath": "britnev-config-training.json",
+                "formspath": "training-forms.html",
+                "mailmergepath": "training-labels.csv"
+            }
+        ]
+
+    Where reportpath and reporthtmlpath are optional.  Relative paths are
+    taken relative to the directory the manifest is in.
+    """
+    def __init__(self, manifest_path):
+        """
+        Create a manifest by reading a manifest file.
+        """
+        manifest_file = open(manifest_path, "r")
+        manifest_json = json.load(manifest_file)  # creates a list
+        manifest_file.close()
+
+        manifest_dir = os.path.dirname(manifest_path)
+
+        self.runs = []
+        for run in manifest_json:
+            for item in (
+                    CONFIG_PATH_ITEM, FORMS_PATH_ITEM, MAIL_MERGE_PATH_ITEM):
+                if item not in run:
+                    print(
+                        "Missing item in manifest run.", file=sys.stderr)
+                    print("  Item: '{0}'".format(item), file=sys.stderr)
+                    sys.exit(-1)
+            for item in (
+                    CONFIG_PATH_ITEM, FORMS_PATH_ITEM, MAIL_MERGE_PATH_ITEM,
+                    REPORT_PATH_ITEM, REPORT_HTML_PATH_ITEM):
+                if item in run:
+                    run[item] = os.path.join(manifest_dir, run[item])
+            self.runs.append(run)
+
+        return None
+
+
+def init_worker(participants):
+    """
+    Runs once in each worker process.  Keep the participant library around so
+    it is not sent again with every run.
+    """
+    global worker_participants
+    worker_participants = participants
+
+    return None
+
+
+def run_config(run_and_config):
+    """
+    Generate all the output for one run of the manifest, in a worker process.
+    """
+    run, config, compress_level, compress_thread = run_and_config
+
+    worker_participants.reset_questions()
+    britnev.generate(
+        config, worker_participants,
+        run[FORMS_PATH_ITEM], run[MAIL_MERGE_PATH_ITEM],
+        run.get(REPORT_PATH_ITEM), run.get(REPORT_HTML_PATH_ITEM),
+        compress_level, compress_thread)
+
+    return run[CONFIG_PATH_ITEM]
+
+
+def get_args():
+    """
+    Parse and return command line arguments.  Note that this does not parse
+    the manifest or the configuration files.
+    """
+
+    arg_parser = argparse.ArgumentParser(description=USAGE)
+
+    arg_parser.add_argument(
+        "--manifestpath", required=True,
+        help=(
+            "Path to manifest listing each configuration file and where to " +
+            "put its output.  Format: JSON"))
+    arg_parser.add_argument(
+        "--participantdatapath", required=True,
+        help=(
+            "Path to participant data spreadsheet.  Format: TSV, " +
+            "optionally gzip, bz2 or xz compressed"))
+    arg_parser.add_argument(
+        "--workers", type=int, default=None,
+        help="Number of worker processes.  Default: one per CPU")
+    arg_parser.add_argument(
+        "--compresslevel", type=int, default=None,
+        help=(
+            "Compression level for outputs whose path ends in .gz, .bz2 " +
+            "or .xz.  Default: the codec's default"))
+    arg_parser.add_argument(
+        "--compressthread", action="store_true",
+        help=(
+            "Compress output in a background thread, alongside rendering, " +
+            "instead of in between"))
+
+    args = arg_parser.parse_args()
+
+    return args
+
+
+def main():
+    args = get_args()
+
+    manifest = Manifest(args.manifestpath)
+
+    # Read every config up front, so a bad one stops us before any work
+    # has been done.
+    configs = [britnev.Configuration(run[CONFIG_PATH_ITEM])
+               for run in manifest.runs]
+
+    # Read the participant list once, for everyone.
+    participants = partis.ParticipantLib(args.participantdatapath)
+
+    # Add participant values to the data-driven questions, sharing the
+    # tallies between configs.
+    value_counts = {}
+    for config in configs:
+        config.data_questions.add_participant_responses(
+            participants, value_counts)
+
+    tasks = [
+        (run, config, args.compresslevel, args.compressthread)
+        for run, config in zip(manifest.runs, configs)]
+    with multiprocessing.Pool(
+            args.workers, initializer=init_worker,
+            initargs=(participants,)) as pool:
+        for config_path in pool.imap_unordered(run_config, tasks):
+            print("Done: {0}".format(config_path))
+
+    return None
+
+
+if __name__ == "__main__":
+    main()
@@ -82,41 +82,62 @@ class DataQuestionLib:
 
         return None
 
-    def add_participant_responses(self, participants):
+    def add_participant_responses(self, participants, value_counts=None):
         """
         These are data driven questions!  Gather the information for each
         question from all the participants.  This information will then
         determine how often each question is asked.
+
+        value_counts, if given, is a cache of already gathered values keyed
+        by (input_item, input_arity).  Passing the same cache to several
+        libraries means each participant column is only tallied once.
         """
-        for participant in participants:
-            for question in self.question_list:
-                values = []
-                value = participant.get_value(question.input_item)
-                if value != "":
-                    if question.input_arity == INPUT_ARITY_LIST:
-                        # need to split up value into multiple values
-                        vals = value.split(", ")
-                        print(vals)
-                        for val in vals:
-                            values.append(val)
-                    else:
-                        values.append(value)
-                # values now contains each value for current question
-                # from current participant.
-                for value in values:
-                    if value not in question.participant_values:
-                        question.participant_values[value] = 0
-                    question.participant_values[value] += 1
-
-        # We are done gathering participant information
-        # convert counts to percentages
-        participant_count = participants.get_count()
+        if value_counts is None:
+            value_counts = {}
 
         for question in self.question_list:
-            for value in question.participant_values:
-                question.participant_values[value] = (
-                    question.participant_values[value] / participant_count)
-                # print("Value: '{0}' %: {1}".format(
-                #     value, question.participant_values[value]))
+            key = (question.input_item, question.input_arity)
+            if key not in value_counts:
+                value_counts[key] = tally_participant_values(
+                    participants, question.input_item, question.input_arity)
+            question.participant_values = value_counts[key]
 
         return
+
+
+def tally_participant_values(participants, input_item, input_arity):
+    """
+    Gather the values participants have for input_item, and return a
+    dictionary of each value and the fraction of participants with it.
+    """
+    participant_values = {}
+
+    for participant in participants:
+        values = []
+        value = participant.get_value(input_item)
+        if value != "":
+            if input_arity == INPUT_ARITY_LIST:
+                # need to split up value into multiple values
+                vals = value.split(", ")
+                for val in vals:
+                    values.append(val)
+            else:
+                values.append(value)
+        # values now contains each value for current question
+        # from current participant.
+        for value in values:
+            if value not in participant_values:
+                participant_values[value] = 0
+            participant_values[value] += 1
+
+    # We are done gathering participant information
+    # convert counts to percentages
+    participant_count = participants.get_count()
+
+    for value in participant_values:
+        participant_values[value] = (
+            participant_values[value] / participant_count)
+        # print("Value: '{0}' %: {1}".format(
+        #     value, participant_values[value]))
+
+    return participant_values
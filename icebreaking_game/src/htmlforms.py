@@ -181,15 +181,34 @@ class Forms:
         self.question_pages.append(QuestionPage(question_list))
         return None
 
+    def html_pieces(self):
+        """
+        Generate the form document as HTML, one piece at a time.
+        """
+        yield DOCUMENT_HEADER
+        for qp in self.question_pages:
+            yield qp.to_html(self.question_limit)
+            yield INSTRUCTIONS
+            yield PAGE_BREAK
+
     def to_html(self):
         """
         Convert the form document to HTML.
         """
-        self.html = []
-        self.html.append(DOCUMENT_HEADER)
-        for qp in self.question_pages:
-            self.html.append(qp.to_html(self.question_limit))
-            self.html.append(INSTRUCTIONS)
-            self.html.append(PAGE_BREAK)
+        self.html = list(self.html_pieces())
 
         return("\n".join(self.html))
+
+    def write_html(self, fp):
+        """
+        Write the form document to fp as HTML.  Same as to_html, but each
+        page is written as soon as it is rendered, instead of building the
+        whole document first.
+        """
+        separator = ""
+        for piece in self.html_pieces():
+            fp.write(separator)
+            fp.write(piece)
+            separator = "\n"
+
+        return None
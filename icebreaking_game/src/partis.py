@@ -4,8 +4,10 @@
 
 import csv
 import math
+import sys
 
 import htmlforms
+import streams
 
 
 class Participant:
@@ -42,15 +44,24 @@ class ParticipantLib:
 
     def __init__(self, participant_file_path):
         """Given the path to a spreadsheet file containing participant info,
-        read it into a new participant library. This only provides serial
-        access to individual records, and to summary information.
+        read it into a new participant library.  The file may be gzip, bz2
+        or xz compressed.  This only provides serial access to individual
+        records, and to summary information.
+
+        Values are interned as they are read.  Rosters repeat the same
+        cities, countries, and organisations over and over, and the library
+        is shipped to worker processes in batch mode.
         """
         self.participants = []
 
-        fp = open(participant_file_path, "r")
+        fp = streams.open_input(participant_file_path)
         participant_reader = csv.DictReader(fp, delimiter='\t')
         for participant_cols in participant_reader:
+            for key, value in participant_cols.items():
+                if isinstance(value, str):
+                    participant_cols[key] = sys.intern(value)
             self.participants.append(Participant(participant_cols))
+        fp.close()
 
         return None
 
@@ -67,25 +78,42 @@ class ParticipantLib:
     def get_count(self):
         return len(self.participants)
 
-    def generate_forms(self, forms_path, num_questions):
+    def reset_questions(self):
+        """
+        Take all allocated questions away from every participant, so the
+        same library can be run through another configuration.
+        """
+        for p in self.participants:
+            p.questions = []
+
+        return None
+
+    def generate_forms(
+            self, forms_path, num_questions,
+            compress_level=None, compress_thread=False):
         """
         Generate a form for each participant.  Limit number of
         questions to num_questions max.
+
+        If forms_path ends in .gz, .bz2 or .xz the forms are compressed
+        as they are written.  See streams.open_output for the compression
+        options.
         """
-        fp = open(forms_path, "w")
+        fp = streams.open_output(forms_path, compress_level, compress_thread)
         doc = htmlforms.Forms(num_questions)
 
         for p in self.participants:
             doc.add_new_form(p.questions)
 
-        fp.write(doc.to_html())
+        doc.write_html(fp)
         fp.close()
 
         return None
 
     def generate_spreadsheet_for_mail_merge(
             self, mail_merge_path, labels_fields,
-            label_columns, label_rows, labels_per_person):
+            label_columns, label_rows, labels_per_person,
+            compress_level=None, compress_thread=False):
         """
         create a spreadsheet that will be fed to a mail merge program in the
         future. This method is told about the dimensions of the label sheet
@@ -96,6 +124,9 @@ class ParticipantLib:
         column, not the same row, this generates a list of entries with
         label_columns - 1 other names in between.  That way, when it gets
         printed, the same person is stacked in each column.
+
+        Like generate_forms, the spreadsheet is compressed if its path
+        asks for it.
         """
         n_participants = len(self.participants)
         n_sheets = math.ceil(n_participants / label_columns)
@@ -123,7 +154,8 @@ class ParticipantLib:
                 column_i = 0
 
         # We be done, now write it out as a csv
-        labels_file = open(mail_merge_path, "w")
+        labels_file = streams.open_output(
+            mail_merge_path, compress_level, compress_thread)
         labels_writer = csv.DictWriter(
             labels_file, fieldnames=labels_fields)
         labels_writer.writeheader()
@@ -2,6 +2,8 @@
 #
 # Defines questions and question libraries for icebreaker.
 
+import bisect
+
 # Define text used to define questions in configuration files
 
 # Non data questions
@@ -31,16 +33,31 @@ class Question:
                  question should occur on question sheets.
     - difficulty is an estimate of how hard this question will be to
                  answer.  From 0 (easy) to 1 (hard)
+
+    Every question also gets an id from the QuestionLib it is first added
+    to.  The id is unique within that library and never changes.  Data
+    question expansion can create a great many questions, so questions keep
+    only these fields.
     """
+    __slots__ = (
+        "id", "text", "penetrance", "difficulty",
+        "data_question", "data_value")
+
     def __init__(self, question_items):
         """
         Given a dictionary of items about a specific question, create
         a Question for it.
         """
+        self.id = None
         self.text = question_items[QUESTION_ITEM]
         self.penetrance = question_items[PENETRANCE_ITEM]
         self.difficulty = question_items[DIFFICULTY_ITEM]
 
+        # Questions converted from data questions remember where they
+        # came from, so coverage can be reported per data question.
+        self.data_question = None
+        self.data_value = None
+
         return None
 
     def get_penetrance(self):
@@ -49,24 +66,165 @@ class Question:
 
 class QuestionLib:
     """A library of questions.
+
+    Questions are indexed by id, and by penetrance and difficulty.  The
+    penetrance and difficulty indexes are sorted lists of (value, id) keys
+    kept in order with bisect, so questions can be added, removed, and
+    updated without re-sorting the library, and looked up by value range.
+    Ties are broken by id, which is the order questions were first added
+    to the library in.  Ids are handed out by the library itself, so they
+    stay unique however the library is copied between processes.
+
+    Change a question's penetrance or difficulty through update_question,
+    not directly, or the indexes will be out of date.
     """
 
     def __init__(self, raw_question_list):
         """Create question library for a set of questions.
         """
 
-        self.question_list = []
+        self.questions_by_id = {}
+        self.next_question_id = 0
         self.total_penetrance = 0.0
         self.question_count = 0
 
+        # (-penetrance, id) so the natural order is decreasing penetrance.
+        self._penetrance_index = []
+        self._difficulty_index = []
+
+        # Orderings already built from the indexes.  Emptied on any change.
+        self._ordering_cache = {}
+
         for raw_q in raw_question_list:
-            q = Question(raw_q)
-            self.question_list.append(q)
-            self.total_penetrance += q.penetrance
-            self.question_count += 1
+            self.add_question(Question(raw_q))
+
+        return None
+
+    def add_question(self, question):
+        """
+        Add a question to the library.  Questions without an id yet are
+        given the library's next one.
+        """
+        if question.id is None:
+            question.id = self.next_question_id
+            self.next_question_id += 1
+        elif question.id in self.questions_by_id:
+            raise ValueError(
+                "Question id {0} is already in the library: '{1}'".format(
+                    question.id, question.text))
+        self.questions_by_id[question.id] = question
+        bisect.insort(
+            self._penetrance_index, (-question.penetrance, question.id))
+        bisect.insort(
+            self._difficulty_index, (question.difficulty, question.id))
+        self.total_penetrance += question.penetrance
+        self.question_count += 1
+        self._ordering_cache = {}
+
+        return None
+
+    def remove_question(self, question):
+        """
+        Remove a question from the library.  Raises ValueError if it is not
+        in the library, or if its penetrance or difficulty was changed
+        without going through update_question.  The library is left
+        untouched when that happens.
+        """
+        if self.questions_by_id.get(question.id) is not question:
+            raise ValueError(
+                "Question is not in the library: '{0}'".format(question.text))
+        penetrance_i = self._find_key(
+            self._penetrance_index, (-question.penetrance, question.id))
+        difficulty_i = self._find_key(
+            self._difficulty_index, (question.difficulty, question.id))
+
+        del self.questions_by_id[question.id]
+        del self._penetrance_index[penetrance_i]
+        del self._difficulty_index[difficulty_i]
+        self.total_penetrance -= question.penetrance
+        self.question_count -= 1
+        self._ordering_cache = {}
+
+        return None
+
+    def update_question(self, question, penetrance=None, difficulty=None):
+        """
+        Change the penetrance and/or difficulty of a question already in
+        the library.
+        """
+        self.remove_question(question)
+        if penetrance is not None:
+            question.penetrance = penetrance
+        if difficulty is not None:
+            question.difficulty = difficulty
+        self.add_question(question)
 
         return None
 
+    def _find_key(self, index, key):
+        """
+        Return where key is in a sorted index.  Raises ValueError if it is
+        not there.
+        """
+        i = bisect.bisect_left(index, key)
+        if i == len(index) or index[i] != key:
+            raise ValueError(
+                "Question {0} is not indexed under {1}; was it changed "
+                "without update_question?".format(key[1], key[0]))
+        return i
+
+    def _questions_for_keys(self, keys):
+        return [self.questions_by_id[q_id] for value, q_id in keys]
+
+    def _cached_ordering(self, name, index):
+        """
+        Return the questions in index order, building the list only once
+        per change to the library.
+        """
+        if name not in self._ordering_cache:
+            self._ordering_cache[name] = self._questions_for_keys(index)
+        return self._ordering_cache[name]
+
+    @property
+    def question_list(self):
+        """
+        All questions, in the order they were added.
+        """
+        if "added" not in self._ordering_cache:
+            self._ordering_cache["added"] = list(
+                self.questions_by_id.values())
+        return self._ordering_cache["added"]
+
+    @property
+    def in_decreasing_penetrance_order(self):
+        return self._cached_ordering(
+            "penetrance", self._penetrance_index)
+
+    @property
+    def in_increasing_difficulty_order(self):
+        return self._cached_ordering(
+            "difficulty", self._difficulty_index)
+
+    def questions_with_penetrance(self, low, high):
+        """
+        Return the questions with low <= penetrance <= high, in decreasing
+        penetrance order.
+        """
+        start = bisect.bisect_left(self._penetrance_index, (-high, -1))
+        end = bisect.bisect_left(
+            self._penetrance_index, (-low, float("inf")))
+        return self._questions_for_keys(self._penetrance_index[start:end])
+
+    def questions_with_difficulty(self, low, high):
+        """
+        Return the questions with low <= difficulty <= high, in increasing
+        difficulty order.
+        """
+        start = bisect.bisect_left(self._difficulty_index, (low, -1))
+        end = bisect.bisect_left(
+            self._difficulty_index, (high, float("inf")))
+        return self._questions_for_keys(self._difficulty_index[start:end])
+
     def convert_and_add_data_questions(
             self, data_questions, min_2b_tractable, max_2b_interesting):
         """
@@ -84,15 +242,8 @@ class QuestionLib:
                     q_items[PENETRANCE_ITEM] = penetrance
                     q_items[DIFFICULTY_ITEM] = 1.0 - penetrance
                     q = Question(q_items)
-                    self.question_list.append(q)
-                    self.total_penetrance += penetrance
-                    self.question_count += 1
-
-        self.in_decreasing_penetrance_order = sorted(
-            self.question_list,
-            key=lambda quest: quest.penetrance, reverse=True)
-        self.in_increasing_difficulty_order = sorted(
-            self.question_list,
-            key=lambda quest: quest.difficulty)
+                    q.data_question = data_q
+                    q.data_value = value
+                    self.add_question(q)
 
         return None
@@ -0,0 +1,101 @@
+#!/usr/local/bin/python3
+#
+# Plans how many times each question is asked, before any are allocated.
+
+import math
+
+
+class QuotaPlan:
+    """
+    How many forms each question goes on.
+
+    Each question asks for penetrance * number of participants forms.  The
+    forms only hold number of participants * questions per form questions
+    in total, so when the questions ask for more than that, every request
+    is scaled down by the same factor.  Counts are then rounded with the
+    largest remainder method, so they add up to exactly what fits.
+    """
+
+    def __init__(self, questions, num_participants, num_questions):
+        """
+        Plan quotas for every question in a question library.
+        """
+        self.num_participants = num_participants
+        self.num_questions = num_questions
+        self.capacity = num_participants * num_questions
+        self.question_list = questions.question_list
+
+        # No question can go on more forms than there are participants.
+        self.requested = [
+            min(q.penetrance, 1.0) * num_participants
+            for q in self.question_list]
+        self.demand = sum(self.requested)
+
+        if self.demand > self.capacity:
+            self.scale = self.capacity / self.demand
+            planned_total = self.capacity
+        else:
+            self.scale = 1.0
+            planned_total = int(round(self.demand))
+
+        scaled = [r * self.scale for r in self.requested]
+        counts = [math.floor(s) for s in scaled]
+
+        # Hand out what rounding down left over, biggest remainders first.
+        leftover = planned_total - sum(counts)
+        by_remainder = sorted(
+            range(len(scaled)),
+            key=lambda q_i: scaled[q_i] - counts[q_i], reverse=True)
+        for q_i in by_remainder[:leftover]:
+            counts[q_i] += 1
+
+        self.planned_total = sum(counts)
+        self.quotas = {}
+        self.requested_counts = {}
+        for q, requested, count in zip(
+                self.question_list, self.requested, counts):
+            self.quotas[q.id] = count
+            self.requested_counts[q.id] = requested
+
+        return None
+
+    def is_over_capacity(self):
+        """
+        Did the questions ask for more than fits on the forms?
+        """
+        return self.demand > self.capacity
+
+    def get_quota(self, question):
+        return self.quotas[question.id]
+
+    def get_requested(self, question):
+        return self.requested_counts[question.id]
+
+    def summary(self):
+        """
+        The plan's totals as a dictionary, ready to be reported.
+        """
+        return {
+            "participants": self.num_participants,
+            "questions_per_form": self.num_questions,
+            "capacity": self.capacity,
+            "demand": self.demand,
+            "scale": self.scale,
+            "planned_total": self.planned_total,
+        }
+
+    def to_dict(self):
+        """
+        The whole plan, totals and per question quotas, as a dictionary.
+        """
+        n = self.num_participants
+        plan = self.summary()
+        plan["quotas"] = [
+            {"question": q.text,
+             "target_penetrance": q.penetrance,
+             "requested_count": requested,
+             "planned_count": self.quotas[q.id],
+             "planned_penetrance": self.quotas[q.id] / n if n else 0.0}
+            for q, requested in zip(self.question_list, self.requested)]
+
+        return plan
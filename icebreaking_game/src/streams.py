@@ -0,0 +1,173 @@
+#!/usr/local/bin/python3
+#
+# Opens input and output files, transparently handling gzip, bz2 and xz
+# compression.  Data always streams through the codec; nothing is
+# decompressed or compressed as a whole in memory.
+
+import bz2
+import gzip
+import io
+import lzma
+import os
+import queue
+import threading
+
+GZIP = "gzip"
+BZ2 = "bz2"
+XZ = "xz"
+
+# How to recognise each format on input, and on output.
+MAGIC_BYTES = {
+    GZIP: b"\x1f\x8b",
+    BZ2: b"BZh",
+    XZ: b"\xfd7zXZ\x00",
+}
+EXTENSIONS = {
+    ".gz": GZIP,
+    ".gzip": GZIP,
+    ".bz2": BZ2,
+    ".xz": XZ,
+}
+
+# Binary openers for each format, and what each calls its level argument.
+OPENERS = {
+    GZIP: (gzip.open, "compresslevel"),
+    BZ2: (bz2.open, "compresslevel"),
+    XZ: (lzma.open, "preset"),
+}
+
+# How many chunks may wait for the compression thread before rendering
+# blocks.  Keeps memory bounded when rendering outpaces compression.
+QUEUE_CHUNKS = 64
+
+
+def sniff_compression(path):
+    """
+    Work out which compression an existing file uses from its first bytes.
+    Returns None for uncompressed files.
+    """
+    fp = open(path, "rb")
+    head = fp.read(max(len(magic) for magic in MAGIC_BYTES.values()))
+    fp.close()
+
+    for compression, magic in MAGIC_BYTES.items():
+        if head.startswith(magic):
+            return compression
+
+    return None
+
+
+def compression_from_extension(path):
+    """
+    Work out which compression a file should use from its name.  Returns
+    None for uncompressed files.
+    """
+    lower_path = path.lower()
+    for extension, compression in EXTENSIONS.items():
+        if lower_path.endswith(extension):
+            return compression
+
+    return None
+
+
+def open_input(path, newline=None):
+    """
+    Open a possibly compressed file for reading as text.  The format is
+    taken from the file's magic bytes, so a file that has already been
+    decompressed but kept its .gz name still reads.  Only an empty file,
+    which has no magic bytes, goes by its extension.
+    """
+    if os.path.getsize(path) == 0:
+        compression = compression_from_extension(path)
+    else:
+        compression = sniff_compression(path)
+    if compression is None:
+        return open(path, "r", newline=newline)
+
+    opener = OPENERS[compression][0]
+    return opener(path, "rt", newline=newline)
+
+
+def open_output(path, compress_level=None, compress_thread=False,
+                newline=None):
+    """
+    Open a file for writing as text, compressing it if its extension asks
+    for it.
+
+    compress_level is passed to the codec; None uses the codec's default.
+    When compress_thread is set, compression happens in a background thread
+    while the caller carries on producing text.
+    """
+    compression = compression_from_extension(path)
+    if compression is None:
+        return open(path, "w", newline=newline)
+
+    opener, level_arg = OPENERS[compression]
+    kwargs = {}
+    if compress_level is not None:
+        kwargs[level_arg] = compress_level
+
+    if not compress_thread:
+        return opener(path, "wt", newline=newline, **kwargs)
+
+    raw = BackgroundWriter(opener(path, "wb", **kwargs))
+    return io.TextIOWrapper(io.BufferedWriter(raw), newline=newline)
+
+
+class BackgroundWriter(io.RawIOBase):
+    """
+    A write only stream that hands everything written to it to a thread,
+    which writes it on to the wrapped stream.  The codecs release the GIL
+    while compressing, so compression overlaps with whatever is producing
+    the data.
+    """
+
+    def __init__(self, stream):
+        """
+        Start a thread writing to stream.  stream is closed along with this.
+        """
+        self._stream = stream
+        self._chunks = queue.Queue(QUEUE_CHUNKS)
+        self._error = None
+        self._thread = threading.Thread(target=self._drain, daemon=True)
+        self._thread.start()
+
+        return None
+
+    def _drain(self):
+        """
+        Thread body.  Write chunks until told to stop.  After an error keep
+        taking chunks, so the writer never blocks, and report it on close.
+        """
+        while True:
+            chunk = self._chunks.get()
+            if chunk is None:
+                break
+            if self._error is None:
+                try:
+                    self._stream.write(chunk)
+                except Exception as error:
+                    self._error = error
+
+        return None
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        if self._error is not None:
+            raise self._error
+        self._chunks.put(bytes(b))
+        return len(b)
+
+    def close(self):
+        if self.closed:
+            return None
+        super().close()
+        self._chunks.put(None)
+        self._thread.join()
+        self._stream.close()
+        if self._error is not None:
+            raise self._error
+
+        return None